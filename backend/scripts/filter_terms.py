@@ -1,13 +1,14 @@
 # backend/scripts/filter_terms.py
 import pandas as pd
 
-df = pd.read_csv("../data/raw/wikidata_terms_raw.csv")
+df = pd.read_csv("../data/raw/wikidata_terms_raw.csv", dtype="string[pyarrow]")
 
-# 1. drop duplicatas exatas
-df = df.drop_duplicates(subset="label")
+# 1. remover rótulos muito curtos (< 3 caracteres) e genéricos
+#    (antes do dedup, para que o hash rode sobre menos linhas; label vazio sai)
+df = df[df["label"].str.len().gt(2).fillna(False)]
 
-# 2. remover rótulos muito curtos (< 3 caracteres) e genéricos
-df = df[df["label"].str.len() > 2]
+# 2. drop duplicatas exatas
+df = df.drop_duplicates(subset="label")
 
 # 3. opcional: ordenar alfabeticamente
 df = df.sort_values("label").reset_index(drop=True)
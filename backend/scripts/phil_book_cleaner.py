@@ -1,22 +1,29 @@
-import re
-
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 
 pd.set_option("display.max_columns", None)
 pd.set_option("display.max_rows", None)
 pd.set_option("display.width", 1000)
 
-# 1) Carrega o CSV
-df = pd.read_csv("data/raw/phil/works_with_pub.csv", dtype=str)
+# 1) Carrega o CSV (strings em buffers Arrow em vez de objetos Python)
+df = pd.read_csv("data/raw/phil/works_with_pub.csv", dtype="string[pyarrow]")
 
-# 2) Limpeza colunas de texto
-df = df.loc[~df["work_label"].str.match(r"^Q\d{3}", na=False)]
-df["pub_date"] = pd.to_datetime(df["pub_date"], errors="coerce")
-df = df[df["pub_date"].notna()]
+# 2) Limpeza colunas de texto (rótulos que são só o Q-ID, sem label)
+#    Regex direto no kernel RE2 do Arrow, sobre os buffers da coluna.
+qid_label = (
+    pc.match_substring_regex(pa.array(df["work_label"]), r"^Q\d{3}")
+    .fill_null(False)
+    .to_pandas()
+    .to_numpy()
+)
+df["pub_date"] = pd.to_datetime(df["pub_date"], errors="coerce", utc=True)
 
-# 4) Monta a máscara de filtro de publicação
-#    - Publicações entre 1801 e 1900:
-mask = (df["pub_date"] > "1801-01-01") & (df["pub_date"] < "1901-01-01")
+# 4) Monta a máscara de filtro de publicação (uma única passada)
+#    - Publicações entre 1801 e 1900; NaT nunca cai no intervalo:
+lo = pd.Timestamp("1801-01-01", tz="UTC")
+hi = pd.Timestamp("1901-01-01", tz="UTC")
+mask = ~qid_label & df["pub_date"].between(lo, hi, inclusive="neither")
 
 # 5) Aplica e vê o resultado
 df = df[mask]
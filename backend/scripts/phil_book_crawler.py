@@ -4,25 +4,65 @@ Script robusto para extrair todas as informações de filósofos do Wikidata e
 listar todas as obras produzidas por cada autor, incluindo coautores.
 """
 import argparse
+import csv
+import io
 import logging
 import os
 import sqlite3
 import sys
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Tuple
 
+import ijson
 import pandas as pd
 import requests
+import requests_cache
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as Urllib3Error
+from urllib3.util.retry import Retry
 
 # Configurações padrão
 DEFAULT_BATCH_SIZE = 25
 DEFAULT_MAX_RETRIES = 3
 DEFAULT_THREADS = 4
+MAX_CONCURRENT_REQUESTS = 5  # política do WDQS: até 5 consultas simultâneas
+READ_CHUNK_SIZE = 50_000  # linhas do CSV de entrada por chunk
+COMMIT_EVERY = 50  # batches por transação (limita fsyncs sem perder tudo num crash)
+HTTP_CACHE_EXPIRE = 7 * 86400  # respostas do WDQS reaproveitadas por 7 dias
 SPARQL_ENDPOINT = "https://query.wikidata.org/sparql"
+ENTITY_PREFIX = "http://www.wikidata.org/entity/"
+PROP_PREFIX = "http://www.wikidata.org/prop/direct/"
 USER_AGENT = "PhilosopherFetcher/1.0 (youremail@example.com)"
+META_COLS = [
+    "person_id",
+    "label_en",
+    "description",
+    "birth",
+    "death",
+    "gender",
+    "nationality",
+    "ethnicity",
+    "religion",
+    "movement",
+    "occ_label",
+]
 LOG_FORMAT = "%(asctime)s %(levelname)s [%(name)s] %(message)s"
 
+# Falhas ao ler/parsear o corpo (truncado, gzip quebrado, conexão caída no meio):
+# o Retry do adapter só cobre conexão e status, então estas são refeitas em
+# fetch_batch
+BODY_ERRORS = (
+    ijson.JSONError,
+    Urllib3Error,
+    requests.exceptions.ChunkedEncodingError,
+    requests.exceptions.ContentDecodingError,
+    requests.ConnectionError,
+)
+
+# Valor padrão para variáveis OPTIONAL sem binding (não deve ser modificado)
+_EMPTY = {"value": ""}
+
 # Logger
 logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
 logger = logging.getLogger("PhilosopherFetcher")
@@ -34,6 +74,8 @@ def init_db(path: str) -> sqlite3.Connection:
     conn = sqlite3.connect(path)
     conn.execute("PRAGMA journal_mode=WAL;")
     conn.execute("PRAGMA synchronous=NORMAL;")
+    conn.execute("PRAGMA wal_autocheckpoint=10000;")
+    conn.execute("PRAGMA temp_store=MEMORY;")
     # Tabela de claims do filósofo
     conn.execute(
         """
@@ -62,32 +104,121 @@ def init_db(path: str) -> sqlite3.Connection:
         """
     )
     conn.execute("CREATE INDEX IF NOT EXISTS idx_works_work ON works(work_qid);")
+    # Pessoas já consultadas com sucesso (mesmo sem nenhuma obra)
+    conn.execute("CREATE TABLE IF NOT EXISTS fetched (person_id TEXT PRIMARY KEY);")
+    # DBs anteriores à tabela: vale o critério antigo (tem claims e works)
+    conn.execute(
+        """
+        INSERT OR IGNORE INTO fetched
+        SELECT person_id FROM claims INTERSECT SELECT person_id FROM works;
+        """
+    )
     conn.commit()
     logger.info("SQLite DB inicializado: %s", path)
     return conn
 
 
-def sparql_query(session: requests.Session, query: str, retries: int) -> Dict[str, Any]:
-    """Executa SPARQL com retry/backoff exponencial."""
-    for attempt in range(1, retries + 1):
-        try:
-            response = session.get(
-                SPARQL_ENDPOINT, params={"query": query, "format": "json"}, timeout=60
-            )
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            backoff = 2**attempt
-            logger.warning(
-                "SPARQL falhou (tentativa %d/%d): %s. Retry em %ds.",
-                attempt,
-                retries,
-                e,
-                backoff,
-            )
-            time.sleep(backoff)
-    logger.error("SPARQL falhou após %d tentativas.", retries)
-    return {}
+def build_session(retries: int, cache_path: str, pool_size: int) -> requests.Session:
+    """Cria sessão HTTP com cache em disco, retry do urllib3 e pool fixo.
+
+    Consultas idênticas (mesmo batch de IDs) são servidas do cache SQLite em
+    `cache_path`; o retry respeita Retry-After em 429/503. O pool mantém
+    `pool_size` conexões keep-alive (uma por thread) e bloqueia em vez de
+    abrir conexões extras, evitando novos handshakes TLS.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=1,
+        status_forcelist=[429, 502, 503, 504],
+        respect_retry_after_header=True,
+    )
+    session = requests_cache.CachedSession(
+        cache_path,
+        backend="sqlite",
+        expire_after=HTTP_CACHE_EXPIRE,
+        allowable_methods=["GET"],
+    )
+    session.headers.update({"User-Agent": USER_AGENT})
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        pool_block=True,
+        max_retries=retry,
+    )
+    session.mount("https://", adapter)
+    return session
+
+
+def sparql_query(session: requests.Session, query: str) -> Iterator[Dict[str, Any]]:
+    """Executa SPARQL e itera os bindings um a um.
+
+    Retries e backoff de HTTP ficam a cargo do adapter da sessão (ver
+    build_session). O CachedSession lê e descomprime o corpo inteiro ao
+    salvar no cache, então o parse (ijson, sem montar a árvore JSON inteira)
+    parte de `response.content`, não do `raw` já consumido.
+    Erros de HTTP, de rede ou de parse (corpo cortado pelo timeout do WDQS)
+    propagam: quem consome deve descartar o que já recebeu.
+    """
+    response = session.get(
+        SPARQL_ENDPOINT, params={"query": query, "format": "json"}, timeout=60
+    )
+    response.raise_for_status()
+    try:
+        yield from ijson.items(io.BytesIO(response.content), "results.bindings.item")
+    except Exception:
+        evict_cached(session, response)
+        raise
+
+
+def evict_cached(session: requests.Session, response: requests.Response) -> None:
+    """Tira do cache HTTP uma resposta 200 com corpo inválido.
+
+    O WDQS responde 200 mesmo quando estoura o timeout (JSON cortado + stack
+    trace Java); se a cópia ficasse no cache, todo retry e toda nova execução
+    leriam o mesmo corpo quebrado até expirar.
+    """
+    if isinstance(session, requests_cache.CachedSession):
+        session.cache.delete(requests=[response.request])
+
+
+def load_meta(conn: sqlite3.Connection, path: str) -> None:
+    """Carrega as colunas fixas do CSV original na tabela temporária `meta`.
+
+    O CSV é lido em chunks, então nenhum DataFrame com a entrada inteira fica
+    em memória durante o crawl.
+    """
+    cols = ", ".join(f"{c} TEXT" for c in META_COLS)
+    conn.execute(f"CREATE TEMP TABLE meta ({cols});")
+    placeholders = ",".join("?" * len(META_COLS))
+    for chunk in pd.read_csv(
+        path, dtype=str, usecols=META_COLS, chunksize=READ_CHUNK_SIZE
+    ):
+        chunk = chunk[META_COLS]
+        conn.executemany(
+            f"INSERT INTO meta VALUES({placeholders})",
+            chunk.where(chunk.notna(), None).itertuples(index=False, name=None),
+        )
+    conn.execute("CREATE INDEX temp.idx_meta_person ON meta(person_id);")
+
+
+def export_query(conn: sqlite3.Connection, sql: str, path: str) -> None:
+    """Grava o resultado de `sql` em CSV direto do cursor, sem DataFrame."""
+    cursor = conn.execute(sql)
+    with open(path, "w", newline="", encoding="utf-8") as fp:
+        writer = csv.writer(fp)
+        writer.writerow([d[0] for d in cursor.description])
+        writer.writerows(cursor)
+
+
+def strip_uri(uri: str, prefix: str = ENTITY_PREFIX) -> str:
+    """Extrai o identificador final de uma URI (Q-ID, P-ID...).
+
+    URIs com o prefixo esperado viram um slice de tamanho fixo; o resultado é
+    internado para que IDs repetidos entre bindings compartilhem a mesma string.
+    """
+    if uri.startswith(prefix):
+        return sys.intern(uri[len(prefix) :])
+    return sys.intern(uri.rsplit("/", 1)[-1])
 
 
 def chunk_list(lst: List[Any], size: int) -> List[List[Any]]:
@@ -95,71 +226,90 @@ def chunk_list(lst: List[Any], size: int) -> List[List[Any]]:
     return [lst[i : i + size] for i in range(0, len(lst), size)]
 
 
-def fetch_claims_batch(
+def fetch_batch(
     session: requests.Session, ids: List[str], retries: int
-) -> List[tuple]:
-    """Busca todas as claims diretas (wdt:) para cada philosopher."""
-    values = " ".join(f"wd:{pid}" for pid in ids)
-    query = f"""
-PREFIX wd: <http://www.wikidata.org/entity/>
-PREFIX wdt: <http://www.wikidata.org/prop/direct/>
-PREFIX bd: <http://www.bigdata.com/rdf#>
-PREFIX wikibase: <http://wikiba.se/ontology#>
-SELECT ?person_id ?p ?pLabel ?o ?oLabel WHERE {{
-  VALUES ?person_id {{ {values} }}
-  ?person_id ?p ?o .
-  FILTER(STRSTARTS(STR(?p), STR(wdt:)))
-  SERVICE wikibase:label {{ bd:serviceParam wikibase:language "en,pt". }}
-}}"""
-    data = sparql_query(session, query, retries).get("results", {}).get("bindings", [])
-    rows = []
-    for b in data:
-        pid = b["person_id"]["value"].split("/")[-1]
-        prop = b["p"]["value"].split("/")[-1]
-        prop_lbl = b.get("pLabel", {}).get("value", "")
-        o = b["o"]
-        val = o["value"].split("/")[-1] if o.get("type") == "uri" else o["value"]
-        val_lbl = b.get("oLabel", {}).get("value", "")
-        rows.append((pid, prop, prop_lbl, val, val_lbl))
-    logger.debug("Batch claims: %d registros", len(rows))
-    return rows
-
-
-def fetch_works_batch(
-    session: requests.Session, ids: List[str], retries: int
-) -> List[tuple]:
-    """Busca todas as obras produzidas e coautores de cada person_id."""
+) -> Tuple[List[tuple], List[tuple]]:
+    """Busca claims diretas (wdt:) e obras/coautores de cada person_id.
+
+    Uma única consulta por batch: os dois blocos compartilham o mesmo VALUES e
+    são unidos com UNION; `?kind` indica a qual tabela cada linha pertence.
+    Tudo ou nada: se a resposta falhar no meio, a exceção propaga e nada do
+    batch é gravado (as pessoas continuam pendentes para a próxima execução).
+    Erros de corpo (BODY_ERRORS) refazem a consulta inteira, com backoff.
+    """
     values = " ".join(f"wd:{pid}" for pid in ids)
     query = f"""
 PREFIX wd: <http://www.wikidata.org/entity/>
 PREFIX wdt: <http://www.wikidata.org/prop/direct/>
 PREFIX bd: <http://www.bigdata.com/rdf#>
 PREFIX wikibase: <http://wikiba.se/ontology#>
-SELECT ?person_id ?work ?workLabel ?author ?authorLabel WHERE {{
+SELECT ?kind ?person_id ?p ?pLabel ?o ?oLabel ?work ?workLabel ?author ?authorLabel
+WHERE {{
   VALUES ?person_id {{ {values} }}
-  {{ ?work wdt:P50   ?person_id }} UNION
-  {{ ?work wdt:P170  ?person_id }} UNION
-  {{ ?person_id wdt:P800 ?work }}
-  ?work (wdt:P50|wdt:P170) ?author .
+  {{
+    ?person_id ?p ?o .
+    FILTER(STRSTARTS(STR(?p), STR(wdt:)))
+    BIND("claim" AS ?kind)
+  }} UNION {{
+    {{ ?work wdt:P50   ?person_id }} UNION
+    {{ ?work wdt:P170  ?person_id }} UNION
+    {{ ?person_id wdt:P800 ?work }}
+    ?work (wdt:P50|wdt:P170) ?author .
+    BIND("work" AS ?kind)
+  }}
   SERVICE wikibase:label {{ bd:serviceParam wikibase:language "en,pt". }}
 }}"""
-    data = sparql_query(session, query, retries).get("results", {}).get("bindings", [])
-    rows = []
-    for b in data:
-        pid = b["person_id"]["value"].split("/")[-1]
-        wqid = b["work"]["value"].split("/")[-1]
-        wlbl = b.get("workLabel", {}).get("value", "")
-        auth = b["author"]["value"].split("/")[-1]
-        albl = b.get("authorLabel", {}).get("value", "")
-        rows.append((pid, wqid, wlbl, auth, albl))
-    logger.debug("Batch works: %d registros", len(rows))
-    return rows
+    attempt = 0
+    while True:
+        try:
+            return collect_rows(session, query)
+        except BODY_ERRORS as e:
+            attempt += 1
+            if attempt >= retries:
+                raise
+            backoff = 2**attempt
+            logger.warning(
+                "Resposta SPARQL inválida (tentativa %d/%d): %s. Retry em %ds.",
+                attempt,
+                retries,
+                e,
+                backoff,
+            )
+            time.sleep(backoff)
+
+
+def collect_rows(
+    session: requests.Session, query: str
+) -> Tuple[List[tuple], List[tuple]]:
+    """Consome a resposta inteira em linhas de claims e de works."""
+    # dicts como conjuntos ordenados: os caminhos P50/P170/P800 repetem linhas,
+    # que assim nem chegam ao INSERT OR IGNORE
+    claims: Dict[tuple, None] = {}
+    works: Dict[tuple, None] = {}
+    for b in sparql_query(session, query):
+        pid = strip_uri(b["person_id"]["value"])
+        if b["kind"]["value"] == "claim":
+            prop = strip_uri(b["p"]["value"], PROP_PREFIX)
+            prop_lbl = b.get("pLabel", _EMPTY)["value"]
+            o = b["o"]
+            val = strip_uri(o["value"]) if o.get("type") == "uri" else o["value"]
+            val_lbl = b.get("oLabel", _EMPTY)["value"]
+            claims[(pid, prop, prop_lbl, val, val_lbl)] = None
+        else:
+            wqid = strip_uri(b["work"]["value"])
+            wlbl = b.get("workLabel", _EMPTY)["value"]
+            auth = strip_uri(b["author"]["value"])
+            albl = b.get("authorLabel", _EMPTY)["value"]
+            works[(pid, wqid, wlbl, auth, albl)] = None
+    logger.debug("Batch: %d claims, %d works", len(claims), len(works))
+    return list(claims), list(works)
 
 
 def main():
     parser = argparse.ArgumentParser(description="Wikidata Philosopher Fetcher")
     parser.add_argument("--input", default="data/processed/phil_persons_1800_1900.csv")
     parser.add_argument("--db", default="data/raw/phil/wikidata_cache.db")
+    parser.add_argument("--http-cache", default="data/raw/phil/http_cache")
     parser.add_argument("--out-meta", default="data/raw/phil/phil_data_enriched.csv")
     parser.add_argument("--out-works", default="data/raw/phil/phil_works_enriched.csv")
     parser.add_argument("--batch", type=int, default=DEFAULT_BATCH_SIZE)
@@ -172,75 +322,90 @@ def main():
     logger.info("Starting with args: %s", args)
 
     # Carrega CSV
-    df = pd.read_csv(args.input, dtype=str)
-    if "person_id" not in df.columns:
-        logger.error("Coluna 'person_id' não encontrada no CSV")
+    columns = pd.read_csv(args.input, dtype=str, nrows=0).columns
+    missing = [c for c in META_COLS if c not in columns]
+    if missing:
+        logger.error("Colunas %s não encontradas no CSV", missing)
         sys.exit(1)
-    ids = df["person_id"].dropna().unique().tolist()
-    logger.info("Total philosophers: %d", len(ids))
 
     # Inicializa DB
     conn = init_db(args.db)
-    session = requests.Session()
-    session.headers.update({"User-Agent": USER_AGENT})
-
-    # Batches de IDs
-    batches = chunk_list(ids, args.batch)
-    logger.info("Gerando %d batches de tamanho %d", len(batches), args.batch)
+    load_meta(conn, args.input)
+    ids = [
+        r[0]
+        for r in conn.execute(
+            "SELECT DISTINCT person_id FROM meta WHERE person_id IS NOT NULL"
+        )
+    ]
+    logger.info("Total philosophers: %d", len(ids))
+    workers = min(args.threads, MAX_CONCURRENT_REQUESTS)
+    session = build_session(args.retries, args.http_cache, workers)
 
-    # 1) Claims sequenciais
-    for i, batch in enumerate(batches, start=1):
-        rows = fetch_claims_batch(session, batch, args.retries)
-        if rows:
-            conn.executemany("INSERT OR IGNORE INTO claims VALUES(?,?,?,?,?)", rows)
-            conn.commit()
-        logger.info("Claims batch %d: %d linhas", i, len(rows))
+    # Batches de IDs, pulando pessoas já consultadas (tabela fetched): quem não
+    # tem obras nunca ganha linha em works, então "tem claims e works" não serve
+    fetched = {r[0] for r in conn.execute("SELECT person_id FROM fetched")}
+    pending = [pid for pid in ids if pid not in fetched]
+    batches = chunk_list(pending, args.batch)
+    logger.info(
+        "%d já em cache, %d batches de tamanho %d",
+        len(ids) - len(pending),
+        len(batches),
+        args.batch,
+    )
 
-    # 2) Works em paralelo
-    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+    # 1) Batches em paralelo; só a thread principal escreve no SQLite
+    with ThreadPoolExecutor(max_workers=workers) as executor:
         future_to_batch = {
-            executor.submit(fetch_works_batch, session, b, args.retries): idx
+            executor.submit(fetch_batch, session, b, args.retries): (idx, b)
             for idx, b in enumerate(batches, start=1)
         }
-        for future in as_completed(future_to_batch):
-            idx = future_to_batch[future]
+        for done, future in enumerate(as_completed(future_to_batch), start=1):
+            idx, batch = future_to_batch[future]
             try:
-                rows = future.result()
-                if rows:
+                claims, works = future.result()
+                if claims:
                     conn.executemany(
-                        "INSERT OR IGNORE INTO works VALUES(?,?,?,?,?)", rows
+                        "INSERT OR IGNORE INTO claims VALUES(?,?,?,?,?)", claims
                     )
-                    conn.commit()
-                logger.info("Works batch %d: %d linhas", idx, len(rows))
+                if works:
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO works VALUES(?,?,?,?,?)", works
+                    )
+                # mesma transação das linhas: só conta como feito o que foi gravado
+                conn.executemany(
+                    "INSERT OR IGNORE INTO fetched VALUES(?)", ((pid,) for pid in batch)
+                )
+                logger.info(
+                    "Batch %d: %d claims, %d works", idx, len(claims), len(works)
+                )
             except Exception as e:
-                logger.error("Erro na works batch %d: %s", idx, e)
-
-    # 3) Construção de CSVs finais
-    df_claims = pd.read_sql_query("SELECT * FROM claims", conn)
-    df_works = pd.read_sql_query("SELECT * FROM works", conn)
+                logger.error("Erro na batch %d: %s", idx, e)
+            if done % COMMIT_EVERY == 0:
+                conn.commit()
+    conn.commit()
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE);")
 
+    # 2) Construção de CSVs finais: joins no SQLite, streaming para o CSV
     # Enriquecer metadata com colunas fixas do CSV original
-    meta_cols = [
-        "person_id",
-        "label_en",
-        "description",
-        "birth",
-        "death",
-        "gender",
-        "nationality",
-        "ethnicity",
-        "religion",
-        "movement",
-        "occ_label",
-    ]
-    df_meta = df[meta_cols].merge(df_claims, on="person_id", how="left")
-    df_meta.to_csv(args.out_meta, index=False)
+    export_query(
+        conn,
+        """
+        SELECT m.*, c.property, c.property_label, c.value, c.value_label
+        FROM meta m LEFT JOIN claims c ON c.person_id = m.person_id
+        """,
+        args.out_meta,
+    )
     logger.info("Salvo metadata enriquecido em %s", args.out_meta)
 
     # Enriquecer obras com nome de autor
-    df_works = df_works.merge(df[["person_id", "label_en"]], on="person_id", how="left")
-    df_works.rename(columns={"label_en": "orig_author_label"}, inplace=True)
-    df_works.to_csv(args.out_works, index=False)
+    export_query(
+        conn,
+        """
+        SELECT w.*, m.label_en AS orig_author_label
+        FROM works w LEFT JOIN meta m ON m.person_id = w.person_id
+        """,
+        args.out_works,
+    )
     logger.info("Salvo works enriquecido em %s", args.out_works)
 
 
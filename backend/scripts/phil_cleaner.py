@@ -4,18 +4,18 @@ pd.set_option("display.max_columns", None)
 pd.set_option("display.max_rows", None)
 pd.set_option("display.width", 1000)
 
-# 1) Carrega o CSV
-df = pd.read_csv("data/raw/phil/phil_persons_by_occ.csv", dtype=str)
+# 1) Carrega o CSV (strings em buffers Arrow em vez de objetos Python)
+df = pd.read_csv("data/raw/phil/phil_persons_by_occ.csv", dtype="string[pyarrow]")
 
 # 2) Converte as colunas para datetime (NaT onde falhar)
-df["birth"] = pd.to_datetime(df["birth"], errors="coerce")
-df["death"] = pd.to_datetime(df["death"], errors="coerce")
+df["birth"] = pd.to_datetime(df["birth"], errors="coerce", utc=True)
+df["death"] = pd.to_datetime(df["death"], errors="coerce", utc=True)
 
-# 3) Opcional: remover linhas que não converteram (birth ou death = NaT)
-df = df[df["birth"].notna() & df["death"].notna()]
-
-# 4) Monta a máscara de filtro corretamente:
-mask = (df["death"] > "1800-01-01") & (df["birth"] < "1901-01-01")
+# 3) Monta a máscara numa única passada, contra limites já tipados.
+#    NaT compara como False, então quem não converteu já fica de fora.
+lo = pd.Timestamp("1800-01-01", tz="UTC")
+hi = pd.Timestamp("1901-01-01", tz="UTC")
+mask = df["death"].gt(lo).to_numpy() & df["birth"].lt(hi).to_numpy()
 
 # 5) Aplica e vê o resultado
 filtered = df[mask]
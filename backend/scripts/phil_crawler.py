@@ -11,19 +11,54 @@ phil_crawler.py
 """
 
 import argparse
+import io
 import logging
 import os
+import sys
 import time
-from typing import Any, Dict, List
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Iterator, List
 
+import ijson
 import pandas as pd
-from SPARQLWrapper import JSON, SPARQLWrapper
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import requests
+import requests_cache
 from tenacity import (RetryError, retry, retry_if_exception_type,
                       stop_after_attempt, wait_exponential)
 
 # Logger global configurado no main
 logger = logging.getLogger(__name__)
 
+ENTITY_PREFIX = "http://www.wikidata.org/entity/"
+
+# Valor padrão para variáveis OPTIONAL sem binding (não deve ser modificado)
+_EMPTY = {"value": ""}
+
+COLUMNS = [
+    "person_id",
+    "label_en",
+    "description",
+    "birth",
+    "death",
+    "gender",
+    "nationality",
+    "ethnicity",
+    "religion",
+    "movement",
+    "notable_work",
+    "occ_id",
+    "occ_label",
+]
+
+
+def strip_qid(uri: str) -> str:
+    """Extrai o Q-ID de uma URI de entidade (slice fixo + string internada)."""
+    if uri.startswith(ENTITY_PREFIX):
+        return sys.intern(uri[len(ENTITY_PREFIX) :])
+    return sys.intern(uri.rsplit("/", 1)[-1])
+
 
 def load_occupations(csv_path: str) -> pd.DataFrame:
     """Carrega e valida CSV de ocupações."""
@@ -50,7 +85,6 @@ def chunk_list(lst: List[str], chunk_size: int) -> List[List[str]]:
 
 def build_sparql_query(chunk: List[str]) -> str:
     """Monta SPARQL com VALUES para o chunk de ocupações."""
-    logger.debug(f"Construindo SPARQL para chunk com Q-IDs: {chunk}")
     values = " ".join(f"wd:{qid}" for qid in chunk)
     query = f"""
 SELECT
@@ -64,7 +98,7 @@ SELECT
   ?ethnicityLabel
   ?religionLabel
   ?movementLabel
-  (GROUP_CONCAT(DISTINCT ?workLabel; SEPARATOR="|") AS ?notable_work)
+  ?workLabel
   ?occ
   ?occLabel
 WHERE {{
@@ -84,67 +118,99 @@ WHERE {{
     bd:serviceParam wikibase:language "en" .
   }}
 }}
-GROUP BY
-  ?person ?personLabel ?itemDescription
-  ?dob ?dod
-  ?genderLabel
-  ?nationalityLabel
-  ?ethnicityLabel
-  ?religionLabel
-  ?movementLabel
-  ?occ ?occLabel
 """
     logger.debug(f"SPARQL construído (tamanho {len(query)} chars)")
     return query
 
 
+def execute_query(
+    session: requests.Session, endpoint_url: str, query: str
+) -> requests.Response:
+    """Executa SPARQL e devolve a resposta (corpo já descomprimido)."""
+    logger.info(f"Executando consulta SPARQL no endpoint {endpoint_url}")
+    start = time.time()
+    response = session.get(
+        endpoint_url,
+        params={"query": query},
+        headers={"Accept": "application/sparql-results+json"},
+        timeout=60,
+    )
+    response.raise_for_status()
+    elapsed = time.time() - start
+    logger.info(f"Consulta respondida em {elapsed:.1f}s")
+    return response
+
+
+def iter_bindings(response: requests.Response) -> Iterator[Dict[str, Any]]:
+    """Itera os bindings da resposta (ijson), um por vez.
+
+    O CachedSession lê e descomprime o corpo ao salvar no cache e troca o
+    `raw`; por isso o parse parte de `response.content`.
+    """
+    yield from ijson.items(io.BytesIO(response.content), "results.bindings.item")
+
+
+def parse_bindings(bindings: Iterable[Dict[str, Any]]) -> List[tuple]:
+    """Converte bindings SPARQL em registros planos (tuplas na ordem de COLUMNS).
+
+    A consulta devolve uma linha por obra (sem GROUP BY no servidor); as obras
+    são agregadas aqui, por combinação dos demais campos, e unidas com "|".
+    """
+    works: Dict[tuple, set] = defaultdict(set)
+    for b in bindings:
+        # um único lookup por campo; OPTIONAL ausente cai no _EMPTY compartilhado
+        get = b.get
+        key = (
+            strip_qid(b["person"]["value"]),
+            get("personLabel", _EMPTY)["value"],
+            get("itemDescription", _EMPTY)["value"],
+            get("dob", _EMPTY)["value"],
+            get("dod", _EMPTY)["value"],
+            get("genderLabel", _EMPTY)["value"],
+            get("nationalityLabel", _EMPTY)["value"],
+            get("ethnicityLabel", _EMPTY)["value"],
+            get("religionLabel", _EMPTY)["value"],
+            get("movementLabel", _EMPTY)["value"],
+            strip_qid(b["occ"]["value"]),
+            get("occLabel", _EMPTY)["value"],
+        )
+        labels = works[key]
+        work = get("workLabel", _EMPTY)["value"]
+        if work:
+            labels.add(work)
+
+    # notable_work entra entre movement e occ_id, na ordem de COLUMNS
+    records = [
+        (*key[:10], "|".join(sorted(labels)), *key[10:])
+        for key, labels in works.items()
+    ]
+    logger.info(f"Parse concluído, registros gerados: {len(records)}")
+    return records
+
+
 @retry(
     stop=stop_after_attempt(3),
     wait=wait_exponential(multiplier=1, min=2, max=10),
     retry=retry_if_exception_type(Exception),
     reraise=True,
 )
-def execute_query(endpoint_url: str, query: str) -> Dict[str, Any]:
-    """Executa SPARQL com retry/backoff."""
-    logger.info(f"Executando consulta SPARQL no endpoint {endpoint_url}")
-    sparql = SPARQLWrapper(endpoint_url, agent="PhilCrawler/1.0")
-    sparql.setQuery(query)
-    sparql.setReturnFormat(JSON)
-    start = time.time()
-    result = sparql.query().convert()
-    elapsed = time.time() - start
-    logger.info(f"Consulta executada em {elapsed:.1f}s")
-    return result
-
-
-def parse_bindings(bindings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    """Converte bindings SPARQL em registros planos."""
-    logger.debug(f"Parseando {len(bindings)} bindings")
-    records = []
-    for idx, b in enumerate(bindings, start=1):
-
-        def val(k: str) -> str:
-            return b.get(k, {}).get("value", "")
-
-        rec = {
-            "person_id": b["person"]["value"].rsplit("/", 1)[-1],
-            "label_en": val("personLabel"),
-            "description": val("itemDescription"),
-            "birth": val("dob"),
-            "death": val("dod"),
-            "gender": val("genderLabel"),
-            "nationality": val("nationalityLabel"),
-            "ethnicity": val("ethnicityLabel"),
-            "religion": val("religionLabel"),
-            "movement": val("movementLabel"),
-            "notable_work": val("notable_work"),
-            "occ_id": b["occ"]["value"].rsplit("/", 1)[-1],
-            "occ_label": val("occLabel"),
-        }
-        logger.debug(f"Registro {idx}: {rec}")
-        records.append(rec)
-    logger.info(f"Parse concluído, registros gerados: {len(records)}")
-    return records
+def fetch_records(
+    session: requests.Session, endpoint_url: str, query: str
+) -> List[tuple]:
+    """Consulta e consome o corpo inteiro com retry/backoff.
+
+    O parse fica dentro do retry: corpo truncado ou malformado (timeout do
+    WDQS no meio da resposta) refaz a consulta em vez de virar chunk parcial.
+    Esse corpo sai do cache HTTP antes do retry, senão ele só repetiria a
+    cópia quebrada.
+    """
+    response = execute_query(session, endpoint_url, query)
+    try:
+        return parse_bindings(iter_bindings(response))
+    except Exception:
+        if isinstance(session, requests_cache.CachedSession):
+            session.cache.delete(requests=[response.request])
+        raise
 
 
 def main():
@@ -174,6 +240,11 @@ def main():
         default=20,
         help="Número de Q-IDs por consulta para evitar timeouts.",
     )
+    parser.add_argument(
+        "--http-cache",
+        default="data/raw/phil/http_cache",
+        help="Cache HTTP (SQLite) das respostas do endpoint.",
+    )
     parser.add_argument(
         "--log-level",
         default="INFO",
@@ -193,33 +264,44 @@ def main():
 
     df_occ = load_occupations(args.input)
     qids = df_occ["occ_id"].tolist()
-    logger.debug(f"Q-IDs carregados: {qids}")
     chunks = chunk_list(qids, args.chunk_size)
 
-    all_records: List[Dict[str, Any]] = []
+    session = requests_cache.CachedSession(
+        args.http_cache,
+        backend="sqlite",
+        expire_after=7 * 86400,
+        allowable_methods=["GET"],
+    )
+    session.headers.update({"User-Agent": "PhilCrawler/1.0"})
+
+    # Dedup por (person_id, occ_id, notable_work), mantendo a primeira ocorrência
+    records: Dict[tuple, tuple] = {}
+    total = 0
     for idx, chunk in enumerate(chunks, start=1):
         logger.info(f"--- Iniciando chunk {idx}/{len(chunks)} ---")
         try:
             query = build_sparql_query(chunk)
-            result = execute_query(args.endpoint, query)
-            bindings = result.get("results", {}).get("bindings", [])
-            logger.info(f"Bindings recebidos no chunk {idx}: {len(bindings)}")
-            recs = parse_bindings(bindings)
-            all_records.extend(recs)
+            recs = fetch_records(session, args.endpoint, query)
+            logger.info(f"Registros recebidos no chunk {idx}: {len(recs)}")
+            total += len(recs)
+            for rec in recs:
+                records.setdefault((rec[0], rec[11], rec[10]), rec)
         except RetryError as re:
             logger.error(f"Chunk {idx} falhou após retries: {re}")
         except Exception as e:
             logger.exception(f"Erro inesperado no chunk {idx}")
 
-    logger.info(f"Total de registros antes de deduplicar: {len(all_records)}")
-    df_out = pd.DataFrame(all_records).drop_duplicates(
-        subset=["person_id", "occ_id", "notable_work"]
-    )
-    logger.info(f"Total de registros após deduplicar: {len(df_out)}")
+    logger.info(f"Total de registros antes de deduplicar: {total}")
+    logger.info(f"Total de registros após deduplicar: {len(records)}")
 
+    # Transpõe as tuplas em colunas e grava com o writer CSV do Arrow
+    columns = list(zip(*records.values())) or [()] * len(COLUMNS)
+    table = pa.table(
+        [pa.array(col, type=pa.string()) for col in columns], names=COLUMNS
+    )
     os.makedirs(os.path.dirname(args.output), exist_ok=True)
-    df_out.to_csv(args.output, index=False)
-    logger.info(f"Salvo {len(df_out)} registros em {args.output}")
+    pacsv.write_csv(table, args.output)
+    logger.info(f"Salvo {table.num_rows} registros em {args.output}")
 
 
 if __name__ == "__main__":
@@ -4,13 +4,29 @@
 
 Correções aplicadas (críticas 1-8, 10):
   • page_size default ↓ 2 000 e auto-dimmer;           #1
-  • pulo de ocupações cujo CSV já existe e contém >0 linhas;
-    evita re-download e serve como *checkpoint*.        #2‒3
+  • checkpoint em raw/_manifest.json: páginas concluídas por
+    ocupação; retomada continua de onde parou, sem duplicar. #2‒3
   • arquivo CSV aberto uma única vez por ocupação;      #4
+    gravado em zstd, um frame por página (truncável/anexável),
+    com birth_yr/death_yr inteiros já calculados no crawl;
+  • páginas de pessoas chegam em text/csv já no formato final
+    (projeção no SPARQL) e vão direto p/ o arquivo, sem parse por linha;
+  • crawl "leve" (nome, datas, ocupação); gênero, país, movimento etc.
+    só p/ quem passa no filtro de datas, em lotes VALUES no consolidate,
+    salvos em raw/enrich.csv.zst (cada pessoa é consultada uma vez só);
+  • recorte de datas também no SPARQL (página e COUNT), mais largo que o
+    filtro do consolidate; nascidos antes de 1700 nem são baixados;
   • retries incluem RemoteDisconnected, JSONDecodeError etc. #5
   • import morto removido; tratamento de erros WDQS ok. #6
-  • delay apenas dentro da paginação (não após cada occ). #7
-  • SPARQLWrapper reutilizado p/ evitar leak de sockets. #10
+  • sem delay fixo: janela deslizante de --rate-per-min consultas
+    + limite de concorrência, que cai pela metade a cada rajada de 429. #7
+  • Session HTTP reutilizada p/ evitar leak de sockets.   #10
+  • ocupações baixadas em paralelo (threads + requests.Session
+    compartilhada), limitadas por semáforo p/ respeitar o WDQS;
+    páginas de uma ocupação buscadas em paralelo após um COUNT;
+  • 429/503/504 pausam o cliente inteiro até o fim do Retry-After;
+  • paginação por pessoa numa subconsulta; rótulos só p/ a página;
+  • uma linha por pessoa: multivalorados via GROUP_CONCAT ("|").
 
 Não implementado: deduplicação final (#9).
 """
@@ -18,21 +34,34 @@ from __future__ import annotations
 
 import argparse
 import csv
+import errno
+import io
 import logging
+import multiprocessing
 import os
 import pathlib
+import random
+import socket
 import sys
+import threading
 import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from dataclasses import dataclass
 from functools import wraps
 from http.client import RemoteDisconnected
 from json import JSONDecodeError
-from typing import Dict, Iterator, List
-from urllib.error import HTTPError as UrlHTTPError
+from typing import Dict, Iterator, List, Tuple
 
+import orjson
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
 import requests
-from SPARQLWrapper import JSON, POST, SPARQLWrapper
+import zstandard as zstd
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
 
 
@@ -47,8 +76,9 @@ class Config:
         "ScholarCrawler/0.4 (https://github.com/you/yourrepo; contact@example.com)",
     )
     page_size: int = 2_000  # << default menor (crítica 1)
-    sleep: float = 1.0  # delay entre lotes
     max_retries: int = 4
+    concurrency: int = 3  # WDQS aceita até 5 consultas simultâneas por IP
+    rate_per_min: int = 60  # limite por IP do WDQS p/ clientes anônimos
     log_level: str = "INFO"
     raw_dir: pathlib.Path = pathlib.Path("data/raw")
     processed_dir: pathlib.Path = pathlib.Path("data/processed")
@@ -62,8 +92,9 @@ class Config:
         add("--endpoint", default=cls.endpoint)
         add("--user-agent", default=cls.user_agent)
         add("--page-size", type=int, default=cls.page_size)
-        add("--sleep", type=float, default=cls.sleep)
         add("--max-retries", type=int, default=cls.max_retries)
+        add("--concurrency", type=int, default=cls.concurrency)
+        add("--rate-per-min", type=int, default=cls.rate_per_min)
         add(
             "--log-level",
             default=cls.log_level,
@@ -77,24 +108,52 @@ class Config:
 ###############################################################################
 
 
-def retry(exceptions, max_retries=4, backoff=2.0):
-    """Exponencial simples; mantém assinatura original da função."""
+# erros de rede que não passam com retry (DNS, porta fechada, sem rota)
+PERMANENT_ERRNOS = {errno.ECONNREFUSED, errno.ENETUNREACH}
+
+
+def _is_permanent(exc: BaseException) -> bool:
+    """Percorre a cadeia requests → urllib3 → socket atrás de um OSError fatal."""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        if isinstance(exc, socket.gaierror):
+            return True
+        if isinstance(exc, OSError) and exc.errno in PERMANENT_ERRNOS:
+            return True
+        nxt = getattr(exc, "reason", None)  # urllib3 MaxRetryError
+        if not isinstance(nxt, BaseException):
+            nxt = exc.args[0] if exc.args else None
+        if not isinstance(nxt, BaseException):
+            nxt = exc.__cause__ or exc.__context__
+        exc = nxt
+    return False
+
+
+def retry(exceptions, max_retries=4, base=1.0, cap=60.0):
+    """Exponencial com *full jitter* (espera uniforme em [0, min(cap, base·2ⁿ)]),
+    p/ que threads e execuções paralelas não re-tentem em sincronia."""
 
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kw):
-            tries, delay = max_retries, 1.0
+            attempt = 0
             while True:
                 try:
                     return fn(*args, **kw)
                 except exceptions as exc:  # pylint: disable=broad-except
-                    tries -= 1
-                    if tries <= 0:
+                    attempt += 1
+                    if attempt >= max_retries or _is_permanent(exc):
                         logging.error("falha definitiva: %s", exc)
                         raise
-                    logging.warning("%s – retry em %.1fs (%d left)", exc, delay, tries)
+                    delay = random.uniform(0, min(cap, base * 2**attempt))
+                    logging.warning(
+                        "%s – retry em %.1fs (%d left)",
+                        exc,
+                        delay,
+                        max_retries - attempt,
+                    )
                     time.sleep(delay)
-                    delay *= backoff
 
         return wrapper
 
@@ -104,52 +163,209 @@ def retry(exceptions, max_retries=4, backoff=2.0):
 ###############################################################################
 # 3. WDQS Client
 ###############################################################################
+THROTTLE_STATUS = {502, 503, 504, 429}  # ← inclui 429
+RETRYABLE = (
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.HTTPError,
+    requests.exceptions.ChunkedEncodingError,  # corpo cortado no meio
+    JSONDecodeError,
+    RemoteDisconnected,
+)
+THROTTLE_429_STEP = 3  # a cada N respostas 429, corta a concorrência pela metade
+
+
+class RateLimiter:
+    """Janela deslizante: no máximo ``rate`` chamadas a cada ``period`` s."""
+
+    def __init__(self, rate: int, period: float = 60.0):
+        self.rate = rate
+        self.period = period
+        self._calls: deque = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._calls and now - self._calls[0] >= self.period:
+                    self._calls.popleft()
+                if len(self._calls) < self.rate:
+                    self._calls.append(now)
+                    return
+                wait = self.period - (now - self._calls[0])
+            time.sleep(wait)
 
 
 class WDQSClient:
+    """Cliente WDQS seguro p/ threads: uma Session (pool de conexões), um
+    limite de ``cfg.rate_per_min`` consultas por minuto e no máximo
+    ``cfg.concurrency`` em voo (reduzido sozinho se chovem 429)."""
+
     def __init__(self, cfg: Config):
         self.cfg = cfg
-        self._sparql = SPARQLWrapper(cfg.endpoint, agent=cfg.user_agent)
-        self._sparql.setMethod(POST)
-        self._sparql.setReturnFormat(JSON)
-        self._sparql.setTimeout(60_000)  # 60 s máx do endpoint
-
-    @retry(
-        (
-            requests.ConnectionError,
-            requests.HTTPError,
-            UrlHTTPError,
-            JSONDecodeError,
-            RemoteDisconnected,
-        ),
-        max_retries=3,
-    )
-    def _run_once(self, query: str) -> List[Dict]:
-        self._sparql.setQuery(query)
+        self._session = requests.Session()
+        self._session.headers.update(
+            {
+                "User-Agent": cfg.user_agent,
+                "Accept": "application/sparql-results+json",
+                # JSON de bindings comprime ~5-8x; requests descomprime sozinho
+                "Accept-Encoding": "gzip, deflate",
+            }
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=cfg.concurrency, pool_block=True
+        )
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self._rate = RateLimiter(cfg.rate_per_min)
+        # semáforo "ajustável": _limit pode cair em tempo de execução
+        self._limit = cfg.concurrency
+        self._in_flight = 0
+        self._n429 = 0
+        self._cond = threading.Condition()
+        # pausa global (monotonic): um throttle do WDQS segura todas as threads
+        self._pause_until = 0.0
+        self._pause_lock = threading.Lock()
+        # pool próprio p/ páginas: as threads de ocupação esperam nele, então
+        # não pode ser o mesmo executor do main (deadlock)
+        self._pages = ThreadPoolExecutor(
+            max_workers=cfg.concurrency, thread_name_prefix="page"
+        )
+
+    @contextmanager
+    def _slot(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._in_flight < self._limit)
+            self._in_flight += 1
         try:
-            return self._sparql.query().convert()["results"]["bindings"]
-
-        except UrlHTTPError as e:
-            if e.code in {502, 503, 504, 429}:  # ← inclui 429
-                # Header Retry-After (segundos) se existir
-                wait = int(e.headers.get("Retry-After", "30"))
-                logging.warning("HTTP %d – dormindo %ss", e.code, wait)
-                time.sleep(wait)
-                raise requests.HTTPError(f"HTTP {e.code}", response=e) from e
-            raise
-
-    def paged(self, template: str) -> Iterator[Dict]:
-        offset = 0
-        while True:
-            q = template.replace("{OFFSET}", str(offset)).replace(
-                "{LIMIT}", str(self.cfg.page_size)
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify()
+
+    def _post(self, query: str, accept: str) -> requests.Response:
+        self._rate.acquire()
+        with self._slot():
+            self._wait_pause()
+            resp = self._session.post(
+                self.cfg.endpoint,
+                data={"query": query},
+                headers={"Accept": accept},
+                timeout=70,  # WDQS corta em 60 s; folga p/ o corpo chegar
             )
-            batch = self._run_once(q)
-            if not batch:
-                break
-            yield from batch
-            offset += self.cfg.page_size
-            time.sleep(self.cfg.sleep)  # única pausa (crítica 7)
+        if resp.status_code in THROTTLE_STATUS or (
+            resp.status_code == 405 and "Retry-After" in resp.headers
+        ):
+            self._pause(resp)
+        if resp.status_code == 429:
+            self._on_429()
+        resp.raise_for_status()
+        return resp
+
+    @retry(RETRYABLE, max_retries=3)
+    def _run_once(self, query: str) -> List[Dict]:
+        resp = self._post(query, "application/sparql-results+json")
+        # orjson.JSONDecodeError herda de json.JSONDecodeError (cai no retry)
+        return orjson.loads(resp.content)["results"]["bindings"]
+
+    @retry(RETRYABLE, max_retries=3)
+    def _run_csv(self, query: str) -> Tuple[bytes, bytes, int]:
+        """Resultado em text/csv: ``(cabeçalho, linhas, nº de registros)``.
+
+        As linhas voltam como bytes crus, prontas p/ gravar; o csv.reader (C)
+        só conta os registros (rótulos podem ter quebra de linha entre aspas).
+        """
+        body = self._post(query, "text/csv").content
+        header, _, rows = body.partition(b"\n")
+        if rows and not rows.endswith(b"\n"):
+            rows += b"\r\n"  # a próxima página é anexada logo depois
+        n = sum(1 for _ in csv.reader(io.StringIO(rows.decode("utf-8"))))
+        return header.rstrip(b"\r"), rows, n
+
+    def _on_429(self):
+        with self._cond:
+            self._n429 += 1
+            if self._n429 % THROTTLE_429_STEP or self._limit == 1:
+                logging.warning("HTTP 429 nº %d", self._n429)
+                return
+            self._limit //= 2  # mesmo espírito do auto-dimmer de page_size
+            n429, limit = self._n429, self._limit
+        logging.warning("%d respostas 429 – concorrência reduzida p/ %d", n429, limit)
+
+    def _wait_pause(self):
+        while True:
+            with self._pause_lock:
+                left = self._pause_until - time.monotonic()
+            if left <= 0:
+                return
+            time.sleep(left)
+
+    def _pause(self, resp: requests.Response):
+        # Header Retry-After (segundos) se existir; formato data HTTP → default
+        try:
+            wait = int(resp.headers.get("Retry-After", "30"))
+        except ValueError:
+            wait = 30
+        with self._pause_lock:
+            until = time.monotonic() + wait
+            if until <= self._pause_until:
+                return  # outra thread já pausou por mais tempo
+            self._pause_until = until
+        logging.warning("HTTP %d – pausando o cliente por %ss", resp.status_code, wait)
+
+    def count(self, template: str) -> int:
+        rows = self._run_once(template)
+        return int(rows[0]["n"]["value"]) if rows else 0
+
+    def _page(
+        self, template: str, params: Dict, offset: int, page_size: int
+    ) -> Tuple[bytes, bytes, int]:
+        return self._run_csv(template % dict(params, limit=page_size, offset=offset))
+
+    def paged(
+        self,
+        template: str,
+        params: Dict,
+        pages: List[Tuple[int, int]],
+        follow: bool = True,
+    ) -> Iterator[Tuple[int, int, Tuple[bytes, bytes, int]]]:
+        """Dispara todas as páginas ``(offset, limit)`` de uma vez e devolve
+        ``(offset, limit, página CSV)`` na ordem em que chegam (a ordem não
+        importa).
+
+        Com ``follow``, se a última página vier cheia (o COUNT ficou defasado
+        porque o Wikidata mudou no meio) segue sequencialmente até uma
+        página incompleta."""
+        futures = {
+            self._pages.submit(self._page, template, params, off, lim): (off, lim)
+            for off, lim in pages
+        }
+        end, lim = max(pages, default=(0, 0))
+        last_full = False
+        try:
+            for fut in as_completed(futures):
+                off, n = futures[fut]
+                page = fut.result()
+                yield off, n, page
+                if off == end:
+                    last_full = follow and page[2] == n
+        finally:
+            for fut in futures:
+                fut.cancel()  # falha numa página: não gasta cota com o resto
+
+        offset = end + lim
+        while last_full:
+            page = self._page(template, params, offset, lim)
+            yield offset, lim, page
+            last_full = page[2] == lim
+            offset += lim
+
+    def csv_many(self, queries: List[str]) -> List[Future]:
+        """Dispara várias consultas CSV no pool de páginas; um Future por
+        consulta (na ordem de ``queries``), p/ tratar falhas uma a uma."""
+        return [self._pages.submit(self._run_csv, q) for q in queries]
 
 
 ###############################################################################
@@ -162,26 +378,103 @@ SELECT ?occ ?lblEN WHERE {
 }
 """
 
-QUERY_PEOPLE_TEMPLATE = """
-SELECT ?person ?personLabel ?birth ?death ?genderLabel ?countryLabel
-       ?ethnicityLabel ?religionLabel ?movementLabel ?notableWorkLabel ?occLabel
+# Seleção das pessoas de uma ocupação, comum à página e ao COUNT. O recorte de
+# datas já roda no WDQS (fora dos OPTIONAL: data ausente passa); é mais largo
+# que o filtro do consolidate, que continua valendo como rede de segurança.
+# Nascidos antes de 1700 ficam de fora de vez.
+PEOPLE_MATCH = """
+      VALUES ?targetOcc { wd:%(occ_id)s }
+      ?person wdt:P31 wd:Q5 ; wdt:P106 ?targetOcc .
+      OPTIONAL { ?person wdt:P569 ?b0. FILTER(isLiteral(?b0)) }
+      OPTIONAL { ?person wdt:P570 ?d0. FILTER(isLiteral(?d0)) }
+      FILTER(!BOUND(?b0) || (?b0 >= "1700-01-01T00:00:00Z"^^xsd:dateTime
+                             && ?b0 < "1902-01-01T00:00:00Z"^^xsd:dateTime))
+      FILTER(!BOUND(?d0) || ?d0 >= "1800-01-01T00:00:00Z"^^xsd:dateTime)
+"""
+# muda quando a seleção/paginação muda: páginas salvas com outra revisão não
+# batem com os offsets novos, então a ocupação parcial recomeça do zero
+PEOPLE_QUERY_REV = 3
+
+# Templates com %-format: só os parâmetros mudam entre ocupações/páginas, o
+# resto do texto é idêntico. A subconsulta pagina as pessoas antes dos OPTIONAL
+# e o SERVICE wikibase:label roda apenas sobre a fatia da página; o ORDER BY
+# fixa a ordem, senão páginas paralelas (ou retomadas) podem se sobrepor.
+# As colunas já saem com os nomes/ordem de RAW_COLUMNS (resposta em CSV vai
+# direto p/ o arquivo); "valor desconhecido" (nó em branco) não entra em MIN/YEAR.
+# Consulta "leve": só o que o filtro de datas precisa. O resto vem depois via
+# QUERY_ENRICH_TEMPLATE, apenas p/ as pessoas que sobrevivem ao filtro.
+QUERY_PEOPLE_TEMPLATE = (
+    """
+SELECT (STRAFTER(STR(?person), "/entity/") AS ?person_id)
+       (SAMPLE(?pLabel) AS ?label_en)
+       (MIN(?b) AS ?birth)
+       (MIN(?d) AS ?death)
+       ("%(occ_id)s" AS ?occ_id)
+       (SAMPLE(?oLabel) AS ?occ_label)
+       (YEAR(MIN(?b)) AS ?birth_yr)
+       (YEAR(MIN(?d)) AS ?death_yr)
 WHERE {
-  VALUES ?targetOcc { wd:{OCC_ID} }
-  ?person wdt:P31 wd:Q5 ; wdt:P106 ?targetOcc .
-  OPTIONAL { ?person wdt:P569 ?birth. }
-  OPTIONAL { ?person wdt:P570 ?death. }
+  {
+    SELECT DISTINCT ?person ?targetOcc WHERE {"""
+    + PEOPLE_MATCH
+    + """    }
+    ORDER BY ?person
+    LIMIT %(limit)d
+    OFFSET %(offset)d
+  }
+  OPTIONAL { ?person wdt:P569 ?b. FILTER(isLiteral(?b)) }
+  OPTIONAL { ?person wdt:P570 ?d. FILTER(isLiteral(?d)) }
+  OPTIONAL { ?targetOcc rdfs:label ?oLabel FILTER(LANG(?oLabel)="en") }
+  SERVICE wikibase:label {
+    bd:serviceParam wikibase:language "en,pt".
+    ?person rdfs:label ?pLabel .
+  }
+}
+GROUP BY ?person
+"""
+)
+
+# Colunas pesadas p/ um lote de pessoas (VALUES). O GROUP BY colapsa o produto
+# cartesiano dos OPTIONAL multivalorados numa linha por pessoa; o label service
+# em modo manual liga os rótulos antes da agregação (fallback en → pt).
+QUERY_ENRICH_TEMPLATE = """
+SELECT (STRAFTER(STR(?person), "/entity/") AS ?person_id)
+       (GROUP_CONCAT(DISTINCT ?gLabel; separator="|") AS ?gender)
+       (GROUP_CONCAT(DISTINCT ?cLabel; separator="|") AS ?nationality)
+       (GROUP_CONCAT(DISTINCT ?eLabel; separator="|") AS ?ethnicity)
+       (GROUP_CONCAT(DISTINCT ?rLabel; separator="|") AS ?religion)
+       (GROUP_CONCAT(DISTINCT ?mLabel; separator="|") AS ?movement)
+       (GROUP_CONCAT(DISTINCT ?wLabel; separator="|") AS ?notable_work)
+WHERE {
+  VALUES ?person { %(values)s }
   OPTIONAL { ?person wdt:P21 ?gender. }
   OPTIONAL { ?person wdt:P27 ?country. }
   OPTIONAL { ?person wdt:P172 ?ethnicity. }
   OPTIONAL { ?person wdt:P140 ?religion. }
   OPTIONAL { ?person wdt:P135 ?movement. }
   OPTIONAL { ?person wdt:P800 ?notableWork. }
-  OPTIONAL { ?targetOcc rdfs:label ?occLabel FILTER(LANG(?occLabel)="en") }
-  SERVICE wikibase:label { bd:serviceParam wikibase:language "en,pt". }
+  SERVICE wikibase:label {
+    bd:serviceParam wikibase:language "en,pt".
+    ?gender rdfs:label ?gLabel .
+    ?country rdfs:label ?cLabel .
+    ?ethnicity rdfs:label ?eLabel .
+    ?religion rdfs:label ?rLabel .
+    ?movement rdfs:label ?mLabel .
+    ?notableWork rdfs:label ?wLabel .
+  }
 }
-LIMIT {LIMIT}
-OFFSET {OFFSET}
+GROUP BY ?person
+"""
+
+# nº de pessoas que a subconsulta acima pagina
+QUERY_PEOPLE_COUNT_TEMPLATE = (
+    """
+SELECT (COUNT(DISTINCT ?person) AS ?n)
+WHERE {"""
+    + PEOPLE_MATCH
+    + """}
 """
+)
 
 ###############################################################################
 # 5. FS helpers
@@ -193,6 +486,44 @@ def ensure_dirs(cfg: Config):
         d.mkdir(parents=True, exist_ok=True)
 
 
+class Manifest:
+    """Checkpoint por ocupação em JSON, regravado atomicamente a cada página.
+
+    ``{occ_id: {"done": bool, "pages": [[offset, limit], ...], "rows": int,
+    "bytes": int}}`` – ``bytes`` é o tamanho do CSV após a última página
+    registrada; na retomada o arquivo é truncado ali (descarta página pela
+    metade).
+    """
+
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            self._data: Dict[str, Dict] = orjson.loads(path.read_bytes())
+        except FileNotFoundError:
+            self._data = {}
+
+    def __contains__(self, occ_id: str) -> bool:
+        with self._lock:
+            return occ_id in self._data
+
+    def done(self) -> set:
+        """Ocupações concluídas (snapshot p/ pular sem tocar no disco)."""
+        with self._lock:
+            return {k for k, v in self._data.items() if v.get("done")}
+
+    def get(self, occ_id: str) -> Dict:
+        with self._lock:
+            return dict(self._data.get(occ_id, {}))
+
+    def update(self, occ_id: str, **fields):
+        with self._lock:
+            self._data.setdefault(occ_id, {}).update(fields)
+            tmp = self.path.with_suffix(".json.tmp")
+            tmp.write_bytes(orjson.dumps(self._data))
+            os.replace(tmp, self.path)  # atômico: nunca fica meio escrito
+
+
 ###############################################################################
 # 6. Pipeline
 ###############################################################################
@@ -212,144 +543,371 @@ def download_occupations(client: WDQSClient, cfg: Config) -> pd.DataFrame:
     return df
 
 
+PEOPLE_COLUMNS = [
+    "person_id",
+    "label_en",
+    "birth",
+    "death",
+    "gender",
+    "nationality",
+    "ethnicity",
+    "religion",
+    "movement",
+    "notable_work",
+    "occ_id",
+    "occ_label",
+]
+# crawl leve; anos (com sinal p/ a.C.) calculados no WDQS: o consolidate não
+# re-parseia datas
+RAW_COLUMNS = [
+    "person_id",
+    "label_en",
+    "birth",
+    "death",
+    "occ_id",
+    "occ_label",
+    "birth_yr",
+    "death_yr",
+]
+RAW_HEADER = ",".join(RAW_COLUMNS).encode()
+ENRICH_COLUMNS = [
+    "person_id",
+    "gender",
+    "nationality",
+    "ethnicity",
+    "religion",
+    "movement",
+    "notable_work",
+]
+ENRICH_HEADER = ",".join(ENRICH_COLUMNS).encode()
+ENRICH_BATCH = 500  # pessoas por consulta VALUES
+ENRICH_KEY = "_enrich"  # entrada do manifesto p/ raw/enrich.csv.zst
+# ano no início do ISO-8601 do Wikidata: "-0350-01-01T…" → "-0350"; usado só
+# p/ CSVs legados, sem birth_yr/death_yr (grupo nomeado: exigido pelo Arrow)
+YEAR_RE = r"^\+?(?P<year>-?\d+)-"
+
+RAW_SUFFIX = ".csv.zst"
+ZSTD_LEVEL = 3
+
+
+def _write_frame(fp, cctx: zstd.ZstdCompressor, data: bytes):
+    """Grava ``data`` como um frame zstd fechado.
+
+    Frames concatenados formam um .zst válido, então o arquivo pode ser
+    truncado no fim de qualquer frame e receber novos frames em modo append.
+    """
+    fp.write(cctx.compress(data))
+
+
+def _open_raw(path: pathlib.Path):
+    """Abre um people_* (zstd multi-frame ou CSV legado) como stream binário."""
+    if path.name.endswith(RAW_SUFFIX):
+        reader = zstd.ZstdDecompressor().stream_reader(
+            path.open("rb"), read_across_frames=True, closefd=True
+        )
+        return reader
+    return path.open("rb")
+
+
 def _csv_has_data(path: pathlib.Path) -> bool:
-    """Retorna True se o CSV existe e tem >1 linha (cabeçalho+dados)."""
-    if not path.exists():
-        return False
+    """Retorna True se o CSV existe e tem >1 linha (cabeçalho+dados).
+
+    Quase sempre basta um stat: o cabeçalho tem ~110 bytes, então acima de
+    1 KiB há dados com certeza; abaixo disso lê os bytes, sem decodificar.
+    """
     try:
-        with path.open("r", encoding="utf-8") as fp:
-            _ = next(fp)  # cabeçalho
-            next(fp)
+        size = path.stat().st_size
+    except FileNotFoundError:
+        return False
+    if size > 1024:
         return True
-    except StopIteration:
-        return False  # só cabeçalho ou vazio
+    _, _, rows = path.read_bytes().partition(b"\n")
+    return bool(rows.strip())
+
+
+def _pending_pages(
+    done: List[Tuple[int, int]], total: int, page_size: int
+) -> List[Tuple[int, int]]:
+    """Páginas ``(offset, limit)`` que faltam p/ cobrir ``total`` pessoas.
+
+    Buracos entre páginas já feitas são cortados no início da próxima (não
+    sobrepõem); a cauda usa o ``page_size`` cheio."""
+    pages, pos = [], 0
+    for off, lim in sorted(done):
+        while pos < min(off, total):
+            n = min(page_size, off - pos)
+            pages.append((pos, n))
+            pos += n
+        pos = max(pos, off + lim)
+    while pos < total:
+        pages.append((pos, page_size))
+        pos += page_size
+    return pages
 
 
 def download_people_per_occ(
-    client: WDQSClient, cfg: Config, occ_id: str, occ_label: str
-):
-    path = cfg.raw_dir / f"people_{occ_id}.csv"
-    if _csv_has_data(path):  # checkpoint (críticas 2-3)
+    client: WDQSClient,
+    cfg: Config,
+    manifest: Manifest,
+    occ_id: str,
+    occ_label: str,
+) -> bool:
+    path = cfg.raw_dir / f"people_{occ_id}{RAW_SUFFIX}"
+    legacy = cfg.raw_dir / f"people_{occ_id}.csv"
+    if occ_id not in manifest and _csv_has_data(legacy):
+        # CSV de antes do manifesto: vale o checkpoint antigo
+        manifest.update(occ_id, done=True)
+    state = manifest.get(occ_id)
+    if state.get("done"):  # checkpoint (críticas 2-3)
         logging.info("→ %s já baixado – pulando", occ_id)
-        return
-
-    header = [
-        "person_id",
-        "label_en",
-        "birth",
-        "death",
-        "gender",
-        "nationality",
-        "ethnicity",
-        "religion",
-        "movement",
-        "notable_work",
-        "occ_id",
-        "occ_label",
-    ]
+        return True
 
     consecutive_fail = 0
-    original_page_size = client.cfg.page_size
+    # page_size local: client.cfg é compartilhado entre as threads
+    page_size = cfg.page_size
+    done_pages = [tuple(pg) for pg in state.get("pages", ())]
+    rows = state.get("rows", 0)
+
+    if done_pages and path.exists() and state.get("rev") == PEOPLE_QUERY_REV:
+        logging.info("→ %s retomado (%d páginas já salvas)", occ_id, len(done_pages))
+        os.truncate(path, state["bytes"])  # descarta página escrita pela metade
+        mode = "a"
+    else:
+        done_pages, rows, mode = [], 0, "w"
 
-    with path.open(
-        "w", newline="", encoding="utf-8"
-    ) as fp:  # abre uma única vez (crítica 4)
-        writer = csv.DictWriter(fp, fieldnames=header)
-        writer.writeheader()
+    # level 3 + threads=-1: compressão barata, em paralelo com a espera HTTP
+    cctx = zstd.ZstdCompressor(level=ZSTD_LEVEL, threads=-1)
+    with path.open(mode + "b") as fp:  # abre uma única vez (crítica 4)
+        if mode == "w":
+            _write_frame(fp, cctx, RAW_HEADER + b"\r\n")
 
         while consecutive_fail < 3:
             try:
-                query = QUERY_PEOPLE_TEMPLATE.replace("{OCC_ID}", occ_id)
-                for row in client.paged(query):
-                    writer.writerow(
-                        {
-                            "person_id": row["person"]["value"].split("/")[-1],
-                            "label_en": row.get("personLabel", {}).get("value", ""),
-                            "birth": row.get("birth", {}).get("value", ""),
-                            "death": row.get("death", {}).get("value", ""),
-                            "gender": row.get("genderLabel", {}).get("value", ""),
-                            "nationality": row.get("countryLabel", {}).get("value", ""),
-                            "ethnicity": row.get("ethnicityLabel", {}).get("value", ""),
-                            "religion": row.get("religionLabel", {}).get("value", ""),
-                            "movement": row.get("movementLabel", {}).get("value", ""),
-                            "notable_work": row.get("notableWorkLabel", {}).get(
-                                "value", ""
-                            ),
-                            "occ_id": occ_id,
-                            "occ_label": occ_label,
-                        }
+                params = {"occ_id": occ_id}
+                total = client.count(QUERY_PEOPLE_COUNT_TEMPLATE % params)
+                pending = _pending_pages(done_pages, total, page_size)
+                # seguir além do COUNT só se a última página pendente é a cauda
+                done_end = max((off + lim for off, lim in done_pages), default=0)
+                follow = bool(pending) and pending[-1][0] >= done_end
+                for offset, limit, (header, body, n) in client.paged(
+                    QUERY_PEOPLE_TEMPLATE, params, pending, follow
+                ):
+                    if header != RAW_HEADER:
+                        raise ValueError(f"cabeçalho inesperado do WDQS: {header!r}")
+                    # página inteira no disco antes de registrá-la no manifesto
+                    _write_frame(fp, cctx, body)
+                    fp.flush()
+                    done_pages.append((offset, limit))
+                    rows += n
+                    manifest.update(
+                        occ_id,
+                        pages=done_pages,
+                        rows=rows,
+                        bytes=fp.tell(),
+                        rev=PEOPLE_QUERY_REV,
                     )
-                client.cfg.page_size = original_page_size
+                manifest.update(occ_id, done=True)
                 return True  # sucesso
 
             except requests.HTTPError as e:
-                if getattr(e, "response", None) and e.response.code not in {
-                    502,
-                    503,
-                    504,
-                    429,
-                }:
+                # Response é falsy p/ status de erro: comparar com None
+                if (
+                    e.response is not None
+                    and e.response.status_code not in THROTTLE_STATUS
+                ):
                     raise  # outro HTTP: propaga
                 consecutive_fail += 1
-                client.cfg.page_size = max(500, client.cfg.page_size // 2)
+                # páginas já salvas ficam; só o que falta é re-paginado menor
+                page_size = max(500, page_size // 2)
                 logging.warning(
                     "⚠️  %s em %s (tentativa %d/3). page_size=%d",
                     e,
                     occ_id,
                     consecutive_fail,
-                    client.cfg.page_size,
+                    page_size,
                 )
                 time.sleep(5)
                 continue
 
     logging.error("✗ Ocupação %s abandonada após 3 falhas consecutivas", occ_id)
-    client.cfg.page_size = original_page_size
     return False
 
 
-def consolidate_people(cfg: Config):
-    """Une todos *people_*.csv* em **processed/scholars.csv** com filtros de data.
+CONSOLIDATE_BLOCK = 16 << 20  # bytes de CSV por RecordBatch ao consolidar
+RAW_TYPES = {c: pa.string() for c in PEOPLE_COLUMNS + RAW_COLUMNS}
+RAW_TYPES.update(birth_yr=pa.int32(), death_yr=pa.int32())
+
+
+def _years(batch: pa.RecordBatch, col: str) -> pa.Array:
+    """Coluna de ano (int32, nula se ausente); CSV legado sem ``*_yr`` extrai
+    o ano da string ISO com o kernel de regex do Arrow."""
+    if f"{col}_yr" in batch.schema.names:
+        return batch.column(f"{col}_yr")
+    parts = pc.extract_regex(batch.column(col), YEAR_RE)
+    return pc.cast(pc.struct_field(parts, [0]), pa.int32())
+
+
+def _enrich(
+    client: WDQSClient, cfg: Config, manifest: Manifest, ids: List[str]
+) -> Tuple[pa.Table, int]:
+    """Colunas pesadas (ENRICH_COLUMNS) p/ ``ids``, em lotes VALUES.
+
+    Cada lote bem-sucedido vira um frame de *raw/enrich.csv.zst* (tamanho
+    registrado no manifesto, como nos people_*), então só quem ainda não está
+    no arquivo é consultado. Lote que falha (após os retries) vai p/ o log.
+    Devolve ``(tabela, nº de pessoas que ficaram sem enriquecimento)``.
+    """
+    path = cfg.raw_dir / f"enrich{RAW_SUFFIX}"
+    convert_opts = pacsv.ConvertOptions(
+        column_types={c: pa.string() for c in ENRICH_COLUMNS}
+    )
+    size = manifest.get(ENRICH_KEY).get("bytes", 0)
+    if size and path.exists():
+        os.truncate(path, size)  # descarta lote escrito pela metade
+        with _open_raw(path) as src:
+            tables = [pacsv.read_csv(src, convert_options=convert_opts)]
+        mode = "a"
+    else:
+        tables = [pa.schema([(c, pa.string()) for c in ENRICH_COLUMNS]).empty_table()]
+        mode = "w"
+
+    done = set(tables[0]["person_id"].to_pylist())
+    todo = [q for q in ids if q not in done]
+    logging.info(
+        "Enriquecimento: %d já salvos, %d a buscar", len(ids) - len(todo), len(todo)
+    )
+    batches = [todo[i : i + ENRICH_BATCH] for i in range(0, len(todo), ENRICH_BATCH)]
+    futures = client.csv_many(
+        [
+            QUERY_ENRICH_TEMPLATE % {"values": " ".join(f"wd:{q}" for q in batch)}
+            for batch in batches
+        ]
+    )
+
+    missing = 0
+    cctx = zstd.ZstdCompressor(level=ZSTD_LEVEL)
+    with path.open(mode + "b") as fp:
+        if mode == "w":
+            _write_frame(fp, cctx, ENRICH_HEADER + b"\r\n")
+            fp.flush()
+            manifest.update(ENRICH_KEY, bytes=fp.tell())
+        for batch, fut in zip(batches, futures):
+            try:
+                header, body, _ = fut.result()
+                if header != ENRICH_HEADER:
+                    raise ValueError(f"cabeçalho inesperado do WDQS: {header!r}")
+                table = pacsv.read_csv(
+                    io.BytesIO(header + b"\r\n" + body), convert_options=convert_opts
+                )
+            except Exception as exc:  # pylint: disable=broad-except
+                logging.error(
+                    "✗ Lote de enriquecimento (%s…) falhou: %r", batch[0], exc
+                )
+                missing += len(batch)
+                continue
+            # lote inteiro no disco antes de registrá-lo no manifesto
+            _write_frame(fp, cctx, body)
+            fp.flush()
+            manifest.update(ENRICH_KEY, bytes=fp.tell())
+            tables.append(table)
+    return pa.concat_tables(tables), missing
+
+
+def consolidate_people(cfg: Config, client: WDQSClient, manifest: Manifest) -> bool:
+    """Une todos *people_*.csv.zst* em **processed/scholars.csv** com filtros de data.
 
     Mantém **apenas**
       – nascimento > 1‑jan‑1801 (exclusivo) e
       – óbito     < 1‑jan‑1901 (exclusivo).
 
-    ⚠️ Deduplicação *não* aplicada (crit. 9 não implementado).
+    As colunas pesadas (gênero, país, movimento…) são buscadas só agora, e só
+    p/ quem passou no filtro e ainda não está em *raw/enrich.csv.zst*. Se algum
+    lote falhar, o scholars.csv existente é mantido e a função devolve False.
+
+    ⚠️ Deduplicação *não* aplicada (crit. 9 não implementado).
     """
 
-    frames = [
-        pd.read_csv(p, dtype=str)
-        for p in cfg.raw_dir.glob("people_*.csv")
-        if _csv_has_data(p)
-    ]
-    if not frames:
+    paths = [
+        p for p in cfg.raw_dir.glob(f"people_*{RAW_SUFFIX}") if p.stat().st_size
+    ] + [p for p in cfg.raw_dir.glob("people_*.csv") if _csv_has_data(p)]
+    if not paths:
         logging.warning("Nenhum CSV de pessoas encontrado")
-        return
-
-    df = pd.concat(frames, ignore_index=True)
-    df.drop(
-        columns=[c for c in df.columns if c.lower() == "field"],
-        errors="ignore",
-        inplace=True,
-    )
-
-    df["death_dt"] = pd.to_datetime(df["death"], errors="coerce", utc=True)
-    df["birth_dt"] = pd.to_datetime(df["birth"], errors="coerce", utc=True)
+        return True
 
-    mask = (
-        df["birth_dt"].dt.year.le(1901) & df["death_dt"].dt.year.ge(1800)
-        | df["death_dt"].isna()
-    )
-    df = df.loc[mask].drop(columns=["death_dt", "birth_dt"])
+    # streaming colunar: um RecordBatch por vez, filtrado com kernels do Arrow;
+    # só os sobreviventes (colunas leves) ficam em memória
+    light_cols = [c for c in PEOPLE_COLUMNS if c in RAW_COLUMNS]
+    read_opts = pacsv.ReadOptions(block_size=CONSOLIDATE_BLOCK)
+    convert_opts = pacsv.ConvertOptions(column_types=RAW_TYPES)
+    kept = [pa.schema([(c, pa.string()) for c in light_cols]).empty_table()]
+    for p in paths:
+        with _open_raw(p) as src:
+            reader = pacsv.open_csv(
+                src, read_options=read_opts, convert_options=convert_opts
+            )
+            for batch in reader:
+                birth_yr = _years(batch, "birth")
+                death_yr = _years(batch, "death")
+                # Kleene: ano nulo compara como nulo, e nulo no filter = fora
+                mask = pc.or_kleene(
+                    pc.and_kleene(
+                        pc.less_equal(birth_yr, 1901),
+                        pc.greater_equal(death_yr, 1800),
+                    ),
+                    pc.is_null(death_yr),
+                )
+                table = pa.Table.from_batches([batch.filter(mask)])
+                kept.append(table.select(light_cols))
+    light = pa.concat_tables(kept)
+
+    ids = pc.unique(light["person_id"]).to_pylist()
+    logging.info("Enriquecendo %d pessoas (%d linhas)", len(ids), light.num_rows)
+    heavy, missing = _enrich(client, cfg, manifest, ids)
+    if missing:
+        # não troca uma saída completa por uma com colunas pesadas vazias
+        logging.error(
+            "✗ %d pessoas sem enriquecimento – scholars.csv não foi atualizado; "
+            "rode de novo p/ buscar só o que falta",
+            missing,
+        )
+        return False
+    people = light.join(heavy, "person_id", join_type="left outer")
 
     out = cfg.processed_dir / "scholars.csv"
-    df.to_csv(out, index=False)
-    logging.info("✓ scholars.csv salvo | %d pessoas", len(df))
+    pacsv.write_csv(people.select(PEOPLE_COLUMNS), str(out))
+    logging.info("✓ scholars.csv salvo | %d pessoas", people.num_rows)
+    return True
 
 
 ###############################################################################
 # 7. Main — salva falhas também em occupations_failed.pdf
 ###############################################################################
+def _render_pdf(failed: List[Tuple[str, str]], pdf_path: pathlib.Path):
+    """PDF enxuto (uma linha por ocupação); roda num processo à parte."""
+    # reportlab é import pesado e só serve p/ este diagnóstico
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import mm
+    from reportlab.pdfgen import canvas
+
+    c = canvas.Canvas(str(pdf_path), pagesize=A4)
+    width, height = A4
+    margin = 15 * mm
+    line_height = 6 * mm
+    per_page = int((height - 2 * margin) // line_height) + 1
+
+    lines = [f"Occupations that failed ({len(failed)} total)", ""]
+    lines += [f"{occ_id} — {occ_label}" for occ_id, occ_label in failed]
+    # um objeto de texto por página em vez de um drawString por linha
+    for start in range(0, len(lines), per_page):
+        text = c.beginText(margin, height - margin)
+        text.setFont("Helvetica", 10)
+        text.setLeading(line_height)
+        text.textLines(lines[start : start + per_page])
+        c.drawText(text)
+        c.showPage()
+    c.save()
+
+
 def main():
     cfg = Config.from_args()
     logging.basicConfig(
@@ -362,47 +920,53 @@ def main():
     client = WDQSClient(cfg)
 
     occ_df = download_occupations(client, cfg)
+    manifest = Manifest(cfg.raw_dir / "_manifest.json")
+
+    # pula concluídas por lookup no conjunto, antes de enfileirar; as parciais
+    # continuam indo p/ download_people_per_occ, que retoma de onde parou
+    done = manifest.done()
+    todo = [
+        (occ_id, occ_label)
+        for occ_id, occ_label in occ_df.itertuples(index=False, name=None)
+        if occ_id not in done
+    ]
+    logging.info("%d ocupações já baixadas – pulando", len(occ_df) - len(todo))
 
     failed: list[tuple[str, str]] = []  # (occ_id, occ_label)
-    for occ_id, occ_label in tqdm(occ_df.values, unit="occ"):
-        ok = download_people_per_occ(client, cfg, occ_id, occ_label)
-        if not ok:
-            failed.append((occ_id, occ_label))
+    # cada ocupação grava no seu próprio CSV, então as threads não disputam arquivo
+    with ThreadPoolExecutor(max_workers=cfg.concurrency) as pool:
+        futures = {
+            pool.submit(
+                download_people_per_occ, client, cfg, manifest, occ_id, occ_label
+            ): (occ_id, occ_label)
+            for occ_id, occ_label in todo
+        }
+        for fut in tqdm(as_completed(futures), total=len(futures), unit="occ"):
+            # erro numa ocupação não derruba o main: vira falha e segue
+            try:
+                ok = fut.result()
+            except Exception as exc:  # pylint: disable=broad-except
+                logging.error("✗ Ocupação %s falhou: %r", futures[fut][0], exc)
+                ok = False
+            if not ok:
+                failed.append(futures[fut])
 
     # ────────────────────────── persistência das falhas ───────────────────────
+    pdf_proc = None
     if failed:
-        import pandas as pd
-        from reportlab.lib.pagesizes import A4
-        from reportlab.lib.units import mm
-        from reportlab.pdfgen import canvas
-
         fail_df = pd.DataFrame(failed, columns=["occ_id", "occ_label"])
 
         # 1) CSV para depuração rápida
         csv_path = cfg.processed_dir / "failed_occupations.csv"
         fail_df.to_csv(csv_path, index=False)
 
-        # 2) PDF enxuto (uma linha por ocupação)
+        # 2) PDF em outro processo, em paralelo com o consolidate; "spawn"
+        #    porque fork com as threads do cliente vivas pode herdar locks presos
         pdf_path = cfg.processed_dir / "occupations_failed.pdf"
-        c = canvas.Canvas(str(pdf_path), pagesize=A4)
-        width, height = A4
-        margin = 15 * mm
-        y = height - margin
-        line_height = 6 * mm
-
-        c.setFont("Helvetica", 10)
-        c.drawString(margin, y, f"Occupations that failed ({len(fail_df)} total)")
-        y -= 2 * line_height
-
-        for occ_id, occ_label in failed:
-            if y < margin:  # nova página se acabou espaço
-                c.showPage()
-                c.setFont("Helvetica", 10)
-                y = height - margin
-            c.drawString(margin, y, f"{occ_id} — {occ_label}")
-            y -= line_height
-
-        c.save()
+        pdf_proc = multiprocessing.get_context("spawn").Process(
+            target=_render_pdf, args=(failed, pdf_path)
+        )
+        pdf_proc.start()
         logging.warning(
             "⚠️  %d ocupações falharam — CSV em %s, PDF em %s",
             len(failed),
@@ -412,7 +976,11 @@ def main():
     else:
         logging.info("✓ Todas as ocupações processadas com sucesso")
 
-    consolidate_people(cfg)
+    ok = consolidate_people(cfg, client, manifest)
+    if pdf_proc is not None:
+        pdf_proc.join()
+    if not ok:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
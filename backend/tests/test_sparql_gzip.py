@@ -0,0 +1,185 @@
+"""Regressão: respostas do WDQS lidas via requests_cache.CachedSession.
+
+Sobe um servidor HTTP local que devolve JSON SPARQL comprimido e confere que
+os crawlers leem todos os bindings, tanto no cache miss quanto no cache hit,
+e que um corpo truncado (timeout do WDQS) não fica no cache: o retry chega de
+novo ao servidor.
+"""
+
+import gzip
+import http.server
+import json
+import pathlib
+import sys
+import threading
+
+import pytest
+import requests_cache
+from tenacity import wait_none
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "scripts"))
+
+import phil_book_crawler  # noqa: E402
+import phil_crawler  # noqa: E402
+
+ENTITY = "http://www.wikidata.org/entity/"
+N_ROWS = 2000
+
+
+def _uri(value):
+    return {"type": "uri", "value": value}
+
+
+def _lit(value):
+    return {"type": "literal", "value": value}
+
+
+def _book_payload():
+    return {
+        "results": {
+            "bindings": [
+                {
+                    "kind": _lit("claim"),
+                    "person_id": _uri(ENTITY + "Q1"),
+                    "p": _uri(phil_book_crawler.PROP_PREFIX + "P800"),
+                    "o": _uri(f"{ENTITY}Q{100 + i}"),
+                }
+                for i in range(N_ROWS)
+            ]
+        }
+    }
+
+
+def _persons_payload():
+    return {
+        "results": {
+            "bindings": [
+                {
+                    "person": _uri(f"{ENTITY}Q{i}"),
+                    "occ": _uri(ENTITY + "Q4964182"),
+                    "workLabel": _lit(f"work {i}"),
+                }
+                for i in range(N_ROWS)
+            ]
+        }
+    }
+
+
+def _truncated(payload):
+    """Como o WDQS responde no timeout: 200, JSON cortado + stack trace Java."""
+    body = json.dumps(payload).encode()
+    return (
+        body[: len(body) // 2]
+        + b"\nSPARQL-QUERY: queryStr=...\n"
+        + b"java.util.concurrent.TimeoutException\n"
+        + b"\tat java.util.concurrent.FutureTask.get(FutureTask.java:205)\n"
+    )
+
+
+@pytest.fixture
+def sparql_server():
+    """Servidor local; ``server.payload`` é o JSON devolvido (gzip) a cada GET,
+    precedido pelos corpos crus de ``server.bodies`` (um por GET), e
+    ``server.requests`` conta os GETs que chegaram até ele."""
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.server.requests += 1
+            if self.server.bodies:
+                raw = self.server.bodies.pop(0)
+            else:
+                raw = json.dumps(self.server.payload).encode()
+            body = gzip.compress(raw)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/sparql-results+json")
+            self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.requests = 0
+    server.bodies = []
+    server.url = f"http://127.0.0.1:{server.server_port}/sparql"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_phil_book_crawler_gzip_cached(sparql_server, tmp_path, monkeypatch):
+    sparql_server.payload = _book_payload()
+    monkeypatch.setattr(phil_book_crawler, "SPARQL_ENDPOINT", sparql_server.url)
+    session = phil_book_crawler.build_session(1, str(tmp_path / "http_cache"), 1)
+
+    for _ in ("miss", "hit"):
+        claims, works = phil_book_crawler.fetch_batch(session, ["Q1"], 1)
+        assert len(claims) == N_ROWS
+        assert works == []
+    assert sparql_server.requests == 1  # a segunda veio do cache
+
+
+def test_phil_crawler_gzip_cached(sparql_server, tmp_path):
+    sparql_server.payload = _persons_payload()
+    session = requests_cache.CachedSession(
+        str(tmp_path / "http_cache"),
+        backend="sqlite",
+        allowable_methods=["GET"],
+    )
+
+    for _ in ("miss", "hit"):
+        records = phil_crawler.fetch_records.retry_with(stop=lambda _: True)(
+            session, sparql_server.url, "SELECT * {}"
+        )
+        assert len(records) == N_ROWS
+    assert sparql_server.requests == 1  # a segunda veio do cache
+
+
+def test_phil_book_crawler_truncated_not_cached(sparql_server, tmp_path, monkeypatch):
+    sparql_server.payload = _book_payload()
+    sparql_server.bodies = [_truncated(sparql_server.payload)]
+    monkeypatch.setattr(phil_book_crawler, "SPARQL_ENDPOINT", sparql_server.url)
+    monkeypatch.setattr(phil_book_crawler.time, "sleep", lambda _: None)
+    session = phil_book_crawler.build_session(1, str(tmp_path / "http_cache"), 1)
+
+    claims, _ = phil_book_crawler.fetch_batch(session, ["Q1"], 3)
+    assert len(claims) == N_ROWS
+    assert sparql_server.requests == 2  # o retry foi ao servidor
+
+
+def test_phil_book_crawler_truncated_rerun(sparql_server, tmp_path, monkeypatch):
+    sparql_server.payload = _book_payload()
+    sparql_server.bodies = [_truncated(sparql_server.payload)]
+    monkeypatch.setattr(phil_book_crawler, "SPARQL_ENDPOINT", sparql_server.url)
+    cache = str(tmp_path / "http_cache")
+
+    with pytest.raises(phil_book_crawler.BODY_ERRORS):
+        phil_book_crawler.fetch_batch(
+            phil_book_crawler.build_session(1, cache, 1), ["Q1"], 1
+        )
+    # nova execução, mesmo cache em disco
+    claims, _ = phil_book_crawler.fetch_batch(
+        phil_book_crawler.build_session(1, cache, 1), ["Q1"], 1
+    )
+    assert len(claims) == N_ROWS
+    assert sparql_server.requests == 2
+
+
+def test_phil_crawler_truncated_not_cached(sparql_server, tmp_path):
+    sparql_server.payload = _persons_payload()
+    sparql_server.bodies = [_truncated(sparql_server.payload)]
+    session = requests_cache.CachedSession(
+        str(tmp_path / "http_cache"),
+        backend="sqlite",
+        allowable_methods=["GET"],
+    )
+
+    records = phil_crawler.fetch_records.retry_with(wait=wait_none())(
+        session, sparql_server.url, "SELECT * {}"
+    )
+    assert len(records) == N_ROWS
+    assert sparql_server.requests == 2  # o retry foi ao servidor